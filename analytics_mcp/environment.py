@@ -0,0 +1,54 @@
+# Copyright 2025 Google LLC All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Process environment and logging setup shared by the server entry points."""
+
+import logging
+import os
+
+from dotenv import load_dotenv
+from uvicorn.config import TRACE_LOG_LEVEL
+
+logger = logging.getLogger("analytics_mcp")
+
+
+def load_dotenv_once() -> None:
+    """Loads the .env file into the environment, once per process tree.
+
+    Worker processes and reloads inherit the environment of the process that
+    already loaded it, so they skip reading and parsing the file again.
+    """
+    if os.getenv("MCP_DOTENV_LOADED") != "1":
+        load_dotenv()
+        os.environ["MCP_DOTENV_LOADED"] = "1"
+
+
+def configure_logging(log_level: str) -> None:
+    """Sets the level of the `analytics_mcp` logger.
+
+    Accepts the same levels as Uvicorn, including its "trace" level below
+    DEBUG, which the logging module doesn't know by name. A handler printing
+    to stderr is only installed when the level lets INFO messages such as
+    the startup banner through. At higher levels, records propagate to the
+    root logger like any other library's.
+    """
+    if log_level.lower() == "trace":
+        logger.setLevel(TRACE_LOG_LEVEL)
+    else:
+        logger.setLevel(log_level.upper())
+    if logger.level <= logging.INFO and not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
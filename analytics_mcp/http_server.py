@@ -0,0 +1,476 @@
+#!/usr/bin/env python
+
+# Copyright 2025 Google LLC All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""HTTP wrapper for the Google Analytics MCP server."""
+
+import contextlib
+import functools
+import os
+import sys
+from typing import Collection, Sequence
+
+import anyio
+import uvicorn
+from uvicorn.main import STARTUP_FAILURE
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from analytics_mcp.environment import (
+    configure_logging,
+    load_dotenv_once,
+    logger,
+)
+
+load_dotenv_once()
+
+from analytics_mcp.coordinator import mcp
+from analytics_mcp.tools import utils
+
+# Import all tools to ensure they're registered with the mcp object
+from analytics_mcp.tools.admin import info  # noqa: F401
+from analytics_mcp.tools.reporting import realtime  # noqa: F401
+from analytics_mcp.tools.reporting import core  # noqa: F401
+
+# The health check and not found bodies never change, so each response is
+# built once and sent for every matching request.
+_HEALTH_RESPONSE = PlainTextResponse("OK")
+_HEALTH_METHOD_NOT_ALLOWED_RESPONSE = PlainTextResponse(
+    "Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"}
+)
+_NOT_FOUND_RESPONSE = PlainTextResponse("Not Found", status_code=404)
+# None of the transports speak WebSocket, so connections are refused the way
+# Starlette's router refuses a WebSocket path it doesn't match.
+_WEBSOCKET_CLOSE = {"type": "websocket.close", "code": 1000}
+
+
+# CORS responses only differ by the echoed origin, so the rest of the headers
+# are encoded once. Mcp-Session-Id is exposed so that browser clients can read
+# the session assigned by the Streamable HTTP transport.
+_VARY_HEADERS = [(b"vary", b"Origin")]
+_CORS_HEADERS = _VARY_HEADERS + [
+    (b"access-control-expose-headers", b"Mcp-Session-Id"),
+]
+_PREFLIGHT_HEADERS = _CORS_HEADERS + [
+    (b"access-control-allow-methods", b"DELETE, GET, OPTIONS, POST"),
+    (
+        b"access-control-allow-headers",
+        b"Authorization, Content-Type, Last-Event-ID, Mcp-Protocol-Version, "
+        b"Mcp-Session-Id",
+    ),
+    (b"access-control-max-age", b"600"),
+]
+
+
+_INVALID_HOST_START = {
+    "type": "http.response.start",
+    "status": 400,
+    "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+}
+_INVALID_HOST_BODY = {"type": "http.response.body", "body": b"Invalid host"}
+
+
+def _host_matches(host: str, allowed_hosts: Sequence[str]) -> bool:
+    """Returns whether `host` matches one of the `allowed_hosts` patterns.
+
+    Patterns follow Starlette's TrustedHostMiddleware: either an exact host
+    name or a "*.example.com" wildcard matching any of its subdomains.
+    """
+    for pattern in allowed_hosts:
+        if host == pattern or (
+            pattern.startswith("*") and host.endswith(pattern[1:])
+        ):
+            return True
+    return False
+
+
+class HTTPMiddleware:
+    """Pure ASGI middleware handling CORS and host validation.
+
+    Both are done in a single pass over the request headers, and requests
+    are passed straight through when neither is configured.
+
+    CORS is off unless `cors_origins` lists the exact origins allowed to make
+    cross-origin requests. For those, preflight requests are answered
+    directly and other responses get the origin echoed back along with
+    precomputed headers. Requests from any other origin get no CORS headers,
+    so browsers don't let the calling page read the response.
+
+    When `allowed_hosts` is given, requests for any other host are rejected
+    with a 400.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        allowed_hosts: Sequence[str] | None = None,
+        cors_origins: Collection[str] | None = None,
+    ) -> None:
+        self.app = app
+        self.allowed_hosts = allowed_hosts
+        self.cors_origins = (
+            frozenset(origin.encode("latin-1") for origin in cors_origins)
+            if cors_origins
+            else None
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or (
+            self.allowed_hosts is None and self.cors_origins is None
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        origin = None
+        preflight = False
+        host = b""
+        for name, value in scope["headers"]:
+            if name == b"host":
+                host = value
+            elif name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                preflight = True
+
+        if self.allowed_hosts is not None and not _host_matches(
+            host.decode("latin-1").split(":")[0], self.allowed_hosts
+        ):
+            await send(_INVALID_HOST_START)
+            await send(_INVALID_HOST_BODY)
+            return
+
+        if self.cors_origins is None or origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        if origin not in self.cors_origins:
+            # Responses still vary by origin for caches, but carry no grant.
+            cors_headers = _VARY_HEADERS
+        else:
+            allow_origin = [(b"access-control-allow-origin", origin)]
+            if preflight and scope["method"] == "OPTIONS":
+                await send(
+                    {
+                        "type": "http.response.start",
+                        "status": 204,
+                        "headers": allow_origin + _PREFLIGHT_HEADERS,
+                    }
+                )
+                await send({"type": "http.response.body", "body": b""})
+                return
+            cors_headers = allow_origin + _CORS_HEADERS
+
+        async def send_with_cors(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", ()))
+                message["headers"].extend(cors_headers)
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+
+def _log_level() -> str:
+    """Returns the log level of Uvicorn and this package (MCP_LOG_LEVEL)."""
+    return os.getenv("MCP_LOG_LEVEL", "warning").lower()
+
+
+def _env_list(name: str) -> list[str]:
+    """Returns the non-empty entries of a comma-separated variable."""
+    return [
+        item.strip() for item in os.getenv(name, "").split(",") if item.strip()
+    ]
+
+
+def _sse_enabled() -> bool:
+    """Returns whether the legacy SSE transport should be served.
+
+    Most clients use Streamable HTTP, so SSE is opt-in to avoid keeping a
+    second transport app alive in every worker.
+    """
+    return os.getenv("MCP_ENABLE_SSE", "0") == "1"
+
+
+def _stateless_http() -> bool:
+    """Returns whether Streamable HTTP should run without sessions.
+
+    Sessions live in the memory of the worker that created them, so with
+    several workers a follow-up request can land on a worker that doesn't
+    know its session. Stateless mode is therefore the default whenever
+    MCP_WORKERS is greater than 1. MCP_STATELESS_HTTP overrides it.
+    """
+    default = "1" if int(os.getenv("MCP_WORKERS", "1")) > 1 else "0"
+    return os.getenv("MCP_STATELESS_HTTP", default) == "1"
+
+
+@contextlib.asynccontextmanager
+async def lifespan(session_manager: StreamableHTTPSessionManager):
+    """Runs `session_manager` for the app's lifetime.
+
+    Google credentials are resolved before the app starts serving, so the
+    first tool call doesn't pay for it. Failing to do so doesn't prevent
+    startup: the error surfaces again on the tool calls that need them.
+    """
+    try:
+        await anyio.to_thread.run_sync(utils.prefetch_credentials)
+    except Exception as e:
+        logger.warning("Could not load Google credentials at startup: %s", e)
+    async with session_manager.run():
+        yield
+
+
+class Dispatcher:
+    """ASGI app routing requests to the MCP transports by static path.
+
+    There are only a handful of fixed paths, so they are compared directly
+    instead of going through Starlette's regex-based router:
+
+    - /health answers GET and HEAD liveness probes.
+    - /mcp (with or without a trailing slash) goes to Streamable HTTP.
+    - /sse and everything under it goes to the legacy SSE app, if any,
+      with the prefix moved into root_path like a Starlette Mount.
+    - Any other path goes to the `fallback` app, if any, or gets a 404.
+
+    The ASGI lifespan protocol is handled here by running `lifespan` for the
+    session manager behind `streamable_http`.
+    WebSocket connections are handed to `fallback`, if any, or closed.
+    """
+
+    def __init__(
+        self,
+        streamable_http: ASGIApp,
+        session_manager: StreamableHTTPSessionManager,
+        sse: ASGIApp | None = None,
+        fallback: ASGIApp | None = None,
+    ) -> None:
+        self.streamable_http = streamable_http
+        self.session_manager = session_manager
+        self.sse = sse
+        self.fallback = fallback
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            if self.fallback is not None:
+                await self.fallback(scope, receive, send)
+            else:
+                await send(_WEBSOCKET_CLOSE)
+            return
+
+        path = scope["path"]
+        if path == "/mcp" or path == "/mcp/":
+            await self.streamable_http(scope, receive, send)
+        elif path == "/health":
+            if scope["method"] in ("GET", "HEAD"):
+                await _HEALTH_RESPONSE(scope, receive, send)
+            else:
+                await _HEALTH_METHOD_NOT_ALLOWED_RESPONSE(scope, receive, send)
+        elif self.sse is not None and (
+            path == "/sse" or path.startswith("/sse/")
+        ):
+            scope = dict(scope, root_path=scope.get("root_path", "") + "/sse")
+            await self.sse(scope, receive, send)
+        elif self.fallback is not None:
+            await self.fallback(scope, receive, send)
+        else:
+            await _NOT_FOUND_RESPONSE(scope, receive, send)
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        """Runs `lifespan` between the startup and shutdown events."""
+        await receive()
+        started = False
+        try:
+            async with lifespan(self.session_manager):
+                await send({"type": "lifespan.startup.complete"})
+                started = True
+                await receive()
+        except BaseException as e:
+            failed = "shutdown" if started else "startup"
+            await send({"type": f"lifespan.{failed}.failed", "message": str(e)})
+            raise
+        await send({"type": "lifespan.shutdown.complete"})
+
+
+@functools.lru_cache(maxsize=None)
+def build_app() -> ASGIApp:
+    """Returns the ASGI app serving the MCP transports.
+
+    The app is built on first call, so each process only pays for the
+    transports it serves. Streamable HTTP is served at /mcp and a health
+    check at /health. The legacy SSE transport is only mounted at /sse when
+    MCP_ENABLE_SSE is set to "1". Cross-origin requests are only allowed from
+    the comma-separated origins in MCP_CORS_ORIGINS (none by default).
+    Requests are restricted to the comma-separated host names in
+    ALLOWED_HOSTS, unless it is empty or "*" (the default). Streamable HTTP
+    runs in stateless mode when served by several workers. Auth and custom
+    routes set up on `mcp` are served through the SDK's own Starlette app.
+    """
+    # Uvicorn workers import the app without going through run_http_server,
+    # so logging is configured wherever the app is built.
+    configure_logging(_log_level())
+
+    stateless = _stateless_http()
+    mcp.settings.stateless_http = stateless
+    app = mcp.streamable_http_app()
+    # The SDK only creates the session manager on the first call, with the
+    # settings of that time, so a later change of mode would go unnoticed.
+    session_manager = mcp.session_manager
+    if session_manager.stateless != stateless:
+        raise RuntimeError(
+            "The Streamable HTTP session manager was already created with "
+            f"stateless_http={session_manager.stateless}"
+        )
+    if (
+        len(app.routes) == 1
+        and not app.user_middleware
+        and isinstance(app.routes[0], Route)
+        and app.routes[0].path == "/mcp"
+    ):
+        # Without auth or custom routes, the Starlette app only routes /mcp
+        # to its endpoint, so requests are handed to the endpoint directly.
+        streamable_http = app.routes[0].endpoint
+        fallback = None
+    else:
+        # Auth middleware, auth endpoints and custom routes all live in the
+        # Starlette app, so it serves /mcp and every path not handled here.
+        # So does /mcp itself on SDK versions that mount it instead of
+        # routing it.
+        streamable_http = fallback = app
+
+    sse = mcp.sse_app() if _sse_enabled() else None
+    allowed_hosts = _env_list("ALLOWED_HOSTS")
+    # Every host passes validation when any host is allowed, so the check is
+    # skipped entirely in that case.
+    if not allowed_hosts or "*" in allowed_hosts:
+        allowed_hosts = None
+    cors_origins = _env_list("MCP_CORS_ORIGINS")
+    return HTTPMiddleware(
+        Dispatcher(streamable_http, session_manager, sse, fallback),
+        allowed_hosts=allowed_hosts,
+        cors_origins=cors_origins,
+    )
+
+
+def __getattr__(name: str):
+    # `starlette_app` is the one app shared by every entry point in a
+    # process. It's resolved through build_app() on first access, so that
+    # importing this module doesn't build any transport app.
+    if name == "starlette_app":
+        return build_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def run_http_server() -> None:
+    """Runs the Google Analytics MCP server with Streamable HTTP transport.
+
+    The host and port are configured via the MCP_HOST and MCP_PORT
+    environment variables. Setting MCP_WORKERS to a value greater than 1
+    serves the app from that many worker processes. Uvicorn's access log is
+    off unless MCP_ACCESS_LOG is "1". MCP_LOG_LEVEL sets the log level of
+    both Uvicorn and this package, e.g. "info" to show the startup banner.
+
+    Connection handling is tuned with MCP_BACKLOG (listen backlog, default
+    2048), MCP_KEEPALIVE (seconds an idle keep-alive connection is held open,
+    default 30) and MCP_LIMIT_CONCURRENCY (maximum number of concurrent
+    connections before a 503 is returned, unlimited by default).
+
+    X-Forwarded-For and X-Forwarded-Proto headers are only trusted when
+    MCP_BEHIND_PROXY is "1".
+
+    On shutdown, in-flight requests get MCP_GRACEFUL_SHUTDOWN seconds
+    (default 10) to complete before their connections are closed.
+
+    When MCP_FD is set, the server accepts connections on that already
+    bound and listening file descriptor instead of binding MCP_HOST and
+    MCP_PORT, e.g. for socket activation by a process manager.
+    """
+    host = os.getenv("MCP_HOST", "127.0.0.1")
+    port = int(os.getenv("MCP_PORT", "8000"))
+    workers = int(os.getenv("MCP_WORKERS", "1"))
+    access_log = os.getenv("MCP_ACCESS_LOG", "0") == "1"
+    log_level = _log_level()
+    configure_logging(log_level)
+    backlog = int(os.getenv("MCP_BACKLOG", "2048"))
+    timeout_keep_alive = int(os.getenv("MCP_KEEPALIVE", "30"))
+    limit_concurrency = os.getenv("MCP_LIMIT_CONCURRENCY")
+    limit_concurrency = int(limit_concurrency) if limit_concurrency else None
+    behind_proxy = os.getenv("MCP_BEHIND_PROXY", "0") == "1"
+    timeout_graceful_shutdown = int(os.getenv("MCP_GRACEFUL_SHUTDOWN", "10"))
+    fd = os.getenv("MCP_FD")
+    fd = int(fd) if fd else None
+
+    if fd is None:
+        logger.info("Starting Google Analytics MCP server on %s:%d", host, port)
+        logger.info("MCP endpoint: http://%s:%d/mcp", host, port)
+        if _sse_enabled():
+            logger.info("SSE endpoint: http://%s:%d/sse/sse", host, port)
+    else:
+        logger.info(
+            "Starting Google Analytics MCP server on file descriptor %d", fd
+        )
+
+    # Every request awaits the Google Analytics APIs, so the server is
+    # I/O-bound. "auto" picks uvloop and the httptools C parser wherever
+    # uvicorn[standard] could install them, and otherwise falls back to the
+    # asyncio loop and h11 parser, e.g. on Windows or PyPy.
+    options = dict(
+        host=host,
+        port=port,
+        fd=fd,
+        loop="auto",
+        http="auto",
+        access_log=access_log,
+        log_level=log_level,
+        lifespan="on",
+        backlog=backlog,
+        timeout_keep_alive=timeout_keep_alive,
+        limit_concurrency=limit_concurrency,
+        timeout_graceful_shutdown=timeout_graceful_shutdown,
+        # Uvicorn parses the forwarding headers of every request by default.
+        # Direct connections have none worth trusting, so skip the work.
+        proxy_headers=behind_proxy,
+        forwarded_allow_ips="*" if behind_proxy else None,
+    )
+
+    if workers > 1:
+        logger.info("Workers: %d", workers)
+        if _sse_enabled():
+            logger.warning("SSE sessions need sticky routing across workers")
+        # Uvicorn can only spawn worker processes from an import string,
+        # since each worker builds the app itself. The worker supervisor is
+        # left to uvicorn.run, as its API differs between Uvicorn versions.
+        uvicorn.run(
+            "analytics_mcp.http_server:starlette_app",
+            workers=workers,
+            **options,
+        )
+        return
+
+    server = uvicorn.Server(uvicorn.Config(build_app(), **options))
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        # Uvicorn re-raises the SIGINT it caught once it has shut down
+        # gracefully, so there is nothing left to report.
+        pass
+    if not server.started:
+        sys.exit(STARTUP_FAILURE)
+
+
+if __name__ == "__main__":
+    run_http_server()
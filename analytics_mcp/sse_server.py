@@ -17,10 +17,14 @@
 """SSE wrapper for the Google Analytics MCP server."""
 
 import os
-from dotenv import load_dotenv
+from analytics_mcp.environment import (
+    configure_logging,
+    load_dotenv_once,
+    logger,
+)
 
 # Load environment variables
-load_dotenv()
+load_dotenv_once()
 
 # Import the existing coordinator which has all tools registered
 from analytics_mcp.coordinator import mcp
@@ -41,14 +45,20 @@ def run_sse_server() -> None:
     host = os.getenv("MCP_SSE_HOST", os.getenv("MCP_HOST", "127.0.0.1"))
     port = int(os.getenv("MCP_SSE_PORT", os.getenv("MCP_PORT", "8000")))
     
-    # Disable host validation for external connections
-    os.environ["MCP_DISABLE_HOST_VALIDATION"] = "1"
-    
+    # Host validation for external connections is disabled through the
+    # transport security settings of the shared `mcp` instance (see
+    # coordinator.py), so no per-connection patching is needed here.
+
     # Configure FastMCP settings for host and port
     mcp.settings.host = host
     mcp.settings.port = port
     
-    print(f"Starting Google Analytics MCP server with SSE transport on {host}:{port}")
+    configure_logging(os.getenv("MCP_LOG_LEVEL", "warning"))
+    logger.info(
+        "Starting Google Analytics MCP server with SSE transport on %s:%d",
+        host,
+        port,
+    )
     
     # Run the server with SSE transport
     mcp.run(transport='sse')
@@ -19,7 +19,9 @@ from typing import Any, Dict
 from google.analytics import admin_v1beta, data_v1beta, admin_v1alpha
 from google.api_core.gapic_v1.client_info import ClientInfo
 from importlib import metadata
+import functools
 import google.auth
+import google.auth.transport.requests
 import proto
 
 
@@ -45,12 +47,27 @@ _READ_ONLY_ANALYTICS_SCOPE = (
 )
 
 
+@functools.lru_cache(maxsize=None)
 def _create_credentials() -> google.auth.credentials.Credentials:
-    """Returns Application Default Credentials with read-only scope."""
+    """Returns Application Default Credentials with read-only scope.
+
+    The credentials are resolved once and shared by all API clients, which
+    refresh the access token whenever it expires.
+    """
     credentials, _ = google.auth.default(scopes=[_READ_ONLY_ANALYTICS_SCOPE])
     return credentials
 
 
+def prefetch_credentials() -> None:
+    """Resolves the credentials and fetches their first access token.
+
+    Lets long-running servers pay for credential discovery and the OAuth
+    round trip at startup instead of on their first API request. Blocks on
+    network I/O, so async callers should run it in a worker thread.
+    """
+    _create_credentials().refresh(google.auth.transport.requests.Request())
+
+
 def create_admin_api_client() -> admin_v1beta.AnalyticsAdminServiceAsyncClient:
     """Returns a properly configured Google Analytics Admin API async client.
 
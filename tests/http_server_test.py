@@ -0,0 +1,513 @@
+# Copyright 2025 Google LLC All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test cases for the http_server module."""
+
+import logging
+import os
+import unittest
+from unittest import mock
+
+
+class TestHttpServer(unittest.TestCase):
+    """Test cases for the http_server module."""
+
+    def setUp(self):
+        """Makes each test build its own app.
+
+        A session manager can only be run once and keeps the stateless mode
+        it was created with, so the SDK's manager is dropped as well.
+        """
+        from analytics_mcp import http_server
+
+        http_server.build_app.cache_clear()
+        self.addCleanup(http_server.build_app.cache_clear)
+        http_server.mcp._session_manager = None
+
+    def test_build_app(self):
+        """Tests that the HTTP app is built.
+
+        This servers as a smoke test to confirm there are no obvious issues
+        with initialization, such as missing imports.
+        """
+        from analytics_mcp import http_server
+
+        self.assertIsNotNone(http_server.build_app(), "HTTP app not built")
+        self.assertIs(http_server.starlette_app, http_server.build_app())
+
+    def test_health_check(self):
+        """Tests that the health check responds with a plain-text OK."""
+        from starlette.testclient import TestClient
+
+        from analytics_mcp import http_server
+
+        client = TestClient(http_server.build_app())
+        for _ in range(2):
+            response = client.get("/health")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.text, "OK")
+            self.assertTrue(
+                response.headers["content-type"].startswith("text/plain")
+            )
+
+    def test_health_check_methods(self):
+        """Tests that the health check only answers GET and HEAD."""
+        from starlette.testclient import TestClient
+
+        from analytics_mcp import http_server
+
+        client = TestClient(http_server.build_app())
+        self.assertEqual(client.head("/health").status_code, 200)
+        response = client.post("/health")
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response.headers["allow"], "GET, HEAD")
+
+    def test_custom_routes(self):
+        """Tests that custom routes of the MCP server are still served."""
+        from starlette.responses import PlainTextResponse
+        from starlette.routing import Route
+        from starlette.testclient import TestClient
+
+        from analytics_mcp import http_server
+
+        async def custom(request):
+            return PlainTextResponse("custom")
+
+        with mock.patch.object(
+            http_server.mcp,
+            "_custom_starlette_routes",
+            [Route("/custom", custom)],
+        ):
+            client = TestClient(http_server.build_app())
+        self.assertEqual(client.get("/custom").text, "custom")
+        self.assertEqual(client.get("/health").text, "OK")
+        self.assertEqual(client.get("/unknown").status_code, 404)
+
+    def test_mounted_streamable_http(self):
+        """Tests SDK versions that mount /mcp instead of routing it."""
+        from starlette.applications import Starlette
+        from starlette.responses import PlainTextResponse
+        from starlette.routing import Mount
+        from starlette.testclient import TestClient
+
+        from analytics_mcp import http_server
+
+        # Creates the session manager, which the patched call below won't.
+        http_server.mcp.streamable_http_app()
+        app = Starlette(routes=[Mount("/mcp", PlainTextResponse("mounted"))])
+        with mock.patch.object(
+            http_server.mcp, "streamable_http_app", return_value=app
+        ):
+            client = TestClient(http_server.build_app())
+        self.assertEqual(client.post("/mcp").text, "mounted")
+        self.assertEqual(client.get("/health").text, "OK")
+
+    def test_auth(self):
+        """Tests that /mcp requires a token when auth is configured."""
+        from mcp.server.auth.settings import AuthSettings
+        from starlette.testclient import TestClient
+
+        from analytics_mcp import http_server
+
+        token_verifier = mock.AsyncMock()
+        token_verifier.verify_token.return_value = None
+        auth = AuthSettings(
+            issuer_url="https://auth.example.com",
+            resource_server_url="https://mcp.example.com",
+            validate_token_resource=False,
+        )
+        with (
+            mock.patch.object(http_server.mcp.settings, "auth", auth),
+            mock.patch.object(
+                http_server.mcp, "_token_verifier", token_verifier
+            ),
+        ):
+            client = TestClient(http_server.build_app())
+        response = client.post(
+            "/mcp",
+            headers={"Authorization": "Bearer invalid"},
+            json={"jsonrpc": "2.0", "id": 1, "method": "ping"},
+        )
+        self.assertEqual(response.status_code, 401)
+        token_verifier.verify_token.assert_called_once_with("invalid")
+
+    def test_websocket_refused(self):
+        """Tests that WebSocket connections are closed on every path."""
+        from starlette.testclient import TestClient
+        from starlette.websockets import WebSocketDisconnect
+
+        from analytics_mcp import http_server
+
+        client = TestClient(http_server.build_app())
+        for path in ("/health", "/mcp", "/unknown"):
+            with self.subTest(path=path):
+                with self.assertRaises(WebSocketDisconnect):
+                    with client.websocket_connect(path):
+                        pass
+
+    def test_cors_disabled_by_default(self):
+        """Tests that no CORS headers are sent unless origins are listed."""
+        from starlette.testclient import TestClient
+
+        from analytics_mcp import http_server
+
+        with mock.patch.dict(os.environ, {"MCP_CORS_ORIGINS": ""}):
+            client = TestClient(http_server.build_app())
+        response = client.get(
+            "/health", headers={"Origin": "https://example.com"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(
+            any(name.startswith("access-control-") for name in response.headers)
+        )
+        response = client.options(
+            "/health",
+            headers={
+                "Origin": "https://example.com",
+                "Access-Control-Request-Method": "POST",
+            },
+        )
+        self.assertNotIn("access-control-allow-origin", response.headers)
+
+    def test_cors_preflight(self):
+        """Tests that preflight requests from allowed origins are answered."""
+        from starlette.testclient import TestClient
+
+        from analytics_mcp import http_server
+
+        with mock.patch.dict(
+            os.environ, {"MCP_CORS_ORIGINS": "https://example.com"}
+        ):
+            client = TestClient(http_server.build_app())
+        response = client.options(
+            "/mcp",
+            headers={
+                "Origin": "https://example.com",
+                "Access-Control-Request-Method": "POST",
+                "Access-Control-Request-Headers": "content-type,mcp-session-id",
+            },
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            response.headers["access-control-allow-origin"],
+            "https://example.com",
+        )
+        self.assertIn(
+            "Mcp-Session-Id", response.headers["access-control-allow-headers"]
+        )
+        self.assertEqual(response.headers["vary"], "Origin")
+
+        response = client.options(
+            "/health",
+            headers={
+                "Origin": "https://evil.example",
+                "Access-Control-Request-Method": "POST",
+            },
+        )
+        self.assertNotEqual(response.status_code, 204)
+        self.assertNotIn("access-control-allow-origin", response.headers)
+
+    def test_cors_headers(self):
+        """Tests that only allowed origins are echoed back."""
+        from starlette.testclient import TestClient
+
+        from analytics_mcp import http_server
+
+        with mock.patch.dict(
+            os.environ,
+            {"MCP_CORS_ORIGINS": "https://example.com, https://example.org"},
+        ):
+            client = TestClient(http_server.build_app())
+        response = client.get(
+            "/health", headers={"Origin": "https://example.org"}
+        )
+        self.assertEqual(
+            response.headers["access-control-allow-origin"],
+            "https://example.org",
+        )
+        self.assertEqual(
+            response.headers["access-control-expose-headers"], "Mcp-Session-Id"
+        )
+        self.assertEqual(response.headers["vary"], "Origin")
+        response = client.get(
+            "/health", headers={"Origin": "https://evil.example"}
+        )
+        self.assertNotIn("access-control-allow-origin", response.headers)
+        self.assertEqual(response.headers["vary"], "Origin")
+        response = client.get("/health")
+        self.assertNotIn("access-control-allow-origin", response.headers)
+
+    def test_allowed_hosts(self):
+        """Tests that ALLOWED_HOSTS rejects requests for other hosts."""
+        from starlette.testclient import TestClient
+
+        from analytics_mcp import http_server
+
+        with mock.patch.dict(
+            os.environ, {"ALLOWED_HOSTS": "example.com, *.example.org"}
+        ):
+            client = TestClient(http_server.build_app())
+        self.assertEqual(client.get("/health").status_code, 400)
+        self.assertEqual(
+            client.get("http://example.com:8000/health").status_code, 200
+        )
+        self.assertEqual(
+            client.get("http://mcp.example.org/health").status_code, 200
+        )
+
+    def test_allowed_hosts_empty(self):
+        """Tests that an empty ALLOWED_HOSTS doesn't restrict hosts."""
+        from starlette.testclient import TestClient
+
+        from analytics_mcp import http_server
+
+        for value in ("", " , "):
+            with self.subTest(value=value):
+                http_server.build_app.cache_clear()
+                with mock.patch.dict(os.environ, {"ALLOWED_HOSTS": value}):
+                    client = TestClient(http_server.build_app())
+                self.assertEqual(client.get("/health").status_code, 200)
+
+    def test_sse_mount(self):
+        """Tests that the legacy SSE transport is only mounted on request."""
+        from starlette.testclient import TestClient
+
+        from analytics_mcp import http_server
+
+        with mock.patch.dict(os.environ, {"MCP_ENABLE_SSE": "0"}):
+            client = TestClient(http_server.build_app())
+        self.assertEqual(client.post("/sse/messages/").status_code, 404)
+
+        http_server.build_app.cache_clear()
+        with mock.patch.dict(os.environ, {"MCP_ENABLE_SSE": "1"}):
+            client = TestClient(http_server.build_app())
+        # Reaches the SSE transport, which rejects the missing session ID.
+        self.assertEqual(client.post("/sse/messages/").status_code, 400)
+
+    def test_dispatch(self):
+        """Tests routing to the Streamable HTTP transport across a lifespan."""
+        from starlette.testclient import TestClient
+
+        from analytics_mcp import http_server
+
+        with (
+            mock.patch.object(
+                http_server.utils, "prefetch_credentials"
+            ) as prefetch_credentials,
+            TestClient(http_server.build_app()) as client,
+        ):
+            prefetch_credentials.assert_called_once()
+            response = client.post(
+                "/mcp",
+                headers={"Accept": "application/json, text/event-stream"},
+                json={
+                    "jsonrpc": "2.0",
+                    "id": 1,
+                    "method": "initialize",
+                    "params": {
+                        "protocolVersion": "2025-06-18",
+                        "capabilities": {},
+                        "clientInfo": {"name": "test", "version": "1.0"},
+                    },
+                },
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("mcp-session-id", response.headers)
+            self.assertEqual(client.get("/unknown").status_code, 404)
+
+    def test_stateless_http_with_workers(self):
+        """Tests that no session is issued when built for several workers."""
+        from starlette.testclient import TestClient
+
+        from analytics_mcp import http_server
+
+        with (
+            mock.patch.dict(os.environ, {"MCP_WORKERS": "4"}),
+            mock.patch.object(http_server.utils, "prefetch_credentials"),
+        ):
+            os.environ.pop("MCP_STATELESS_HTTP", None)
+            with TestClient(http_server.build_app()) as client:
+                response = client.post(
+                    "/mcp",
+                    headers={"Accept": "application/json, text/event-stream"},
+                    json={
+                        "jsonrpc": "2.0",
+                        "id": 1,
+                        "method": "initialize",
+                        "params": {
+                            "protocolVersion": "2025-06-18",
+                            "capabilities": {},
+                            "clientInfo": {"name": "test", "version": "1.0"},
+                        },
+                    },
+                )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("mcp-session-id", response.headers)
+        self.assertTrue(http_server.mcp.session_manager.stateless)
+
+    def test_lifespan_runs_own_session_manager(self):
+        """Tests that an app runs its session manager, not the latest one."""
+        from starlette.testclient import TestClient
+
+        from analytics_mcp import http_server
+
+        app = http_server.build_app()
+        http_server.build_app.cache_clear()
+        http_server.mcp._session_manager = None
+        self.assertIsNot(http_server.build_app(), app)
+        with (
+            mock.patch.object(http_server.utils, "prefetch_credentials"),
+            TestClient(app) as client,
+        ):
+            response = client.post(
+                "/mcp",
+                headers={"Accept": "application/json, text/event-stream"},
+                json={
+                    "jsonrpc": "2.0",
+                    "id": 1,
+                    "method": "initialize",
+                    "params": {
+                        "protocolVersion": "2025-06-18",
+                        "capabilities": {},
+                        "clientInfo": {"name": "test", "version": "1.0"},
+                    },
+                },
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_session_manager_mode_mismatch(self):
+        """Tests that a session manager in the wrong mode is not reused."""
+        from analytics_mcp import http_server
+
+        with mock.patch.dict(os.environ, {"MCP_STATELESS_HTTP": "0"}):
+            http_server.build_app()
+        http_server.build_app.cache_clear()
+        with mock.patch.dict(os.environ, {"MCP_STATELESS_HTTP": "1"}):
+            with self.assertRaises(RuntimeError):
+                http_server.build_app()
+
+    def test_stateless_http(self):
+        """Tests that Streamable HTTP is stateless with several workers."""
+        from analytics_mcp import http_server
+
+        cases = [
+            ({}, False),
+            ({"MCP_WORKERS": "4"}, True),
+            ({"MCP_WORKERS": "4", "MCP_STATELESS_HTTP": "0"}, False),
+            ({"MCP_STATELESS_HTTP": "1"}, True),
+        ]
+        for env, expected in cases:
+            with self.subTest(env=env):
+                with mock.patch.dict(os.environ, env, clear=True):
+                    self.assertEqual(http_server._stateless_http(), expected)
+
+    def test_run_http_server(self):
+        """Tests the Uvicorn options for one and for several workers."""
+        from analytics_mcp import http_server
+
+        env = {
+            "MCP_HOST": "0.0.0.0",
+            "MCP_PORT": "9000",
+            "MCP_ACCESS_LOG": "1",
+            "MCP_LOG_LEVEL": "error",
+            "MCP_BACKLOG": "128",
+            "MCP_KEEPALIVE": "5",
+            "MCP_LIMIT_CONCURRENCY": "100",
+            "MCP_BEHIND_PROXY": "1",
+            "MCP_GRACEFUL_SHUTDOWN": "3",
+            "MCP_FD": "3",
+        }
+        expected = dict(
+            host="0.0.0.0",
+            port=9000,
+            fd=3,
+            loop="auto",
+            http="auto",
+            access_log=True,
+            log_level="error",
+            lifespan="on",
+            backlog=128,
+            timeout_keep_alive=5,
+            limit_concurrency=100,
+            timeout_graceful_shutdown=3,
+            proxy_headers=True,
+            forwarded_allow_ips="*",
+        )
+        logger = logging.getLogger("analytics_mcp")
+        self.addCleanup(logger.setLevel, logger.level)
+
+        with (
+            mock.patch.dict(os.environ, env, clear=True),
+            mock.patch.object(http_server.uvicorn, "run") as run,
+            mock.patch.object(http_server.uvicorn, "Config") as config,
+            mock.patch.object(http_server.uvicorn, "Server") as server,
+        ):
+            http_server.run_http_server()
+        run.assert_not_called()
+        config.assert_called_once_with(http_server.build_app(), **expected)
+        server.assert_called_once_with(config.return_value)
+        server.return_value.run.assert_called_once_with()
+
+        defaults = dict(
+            expected,
+            host="127.0.0.1",
+            port=8000,
+            fd=None,
+            access_log=False,
+            log_level="warning",
+            backlog=2048,
+            timeout_keep_alive=30,
+            limit_concurrency=None,
+            timeout_graceful_shutdown=10,
+            proxy_headers=False,
+            forwarded_allow_ips=None,
+        )
+        with (
+            mock.patch.dict(os.environ, {"MCP_WORKERS": "4"}, clear=True),
+            mock.patch.object(http_server.uvicorn, "run") as run,
+            mock.patch.object(http_server.uvicorn, "Server") as server,
+        ):
+            http_server.run_http_server()
+        server.assert_not_called()
+        run.assert_called_once_with(
+            "analytics_mcp.http_server:starlette_app", workers=4, **defaults
+        )
+
+    def test_build_app_configures_logging(self):
+        """Tests that building the app applies MCP_LOG_LEVEL.
+
+        Uvicorn workers build the app without running run_http_server, so
+        this is where their logging gets configured.
+        """
+        from analytics_mcp import http_server
+
+        logger = logging.getLogger("analytics_mcp")
+        self.addCleanup(logger.setLevel, logger.level)
+        with mock.patch.dict(os.environ, {"MCP_LOG_LEVEL": "error"}):
+            http_server.build_app()
+        self.assertEqual(logger.level, logging.ERROR)
+
+    def test_build_app_trace_logging(self):
+        """Tests that Uvicorn's "trace" level is accepted in MCP_LOG_LEVEL."""
+        from uvicorn.config import TRACE_LOG_LEVEL
+
+        from analytics_mcp import http_server
+
+        logger = logging.getLogger("analytics_mcp")
+        self.addCleanup(setattr, logger, "propagate", logger.propagate)
+        self.addCleanup(setattr, logger, "handlers", list(logger.handlers))
+        self.addCleanup(logger.setLevel, logger.level)
+        with mock.patch.dict(os.environ, {"MCP_LOG_LEVEL": "trace"}):
+            http_server.build_app()
+        self.assertEqual(logger.level, TRACE_LOG_LEVEL)
@@ -15,6 +15,7 @@
 """Test cases for the utils module."""
 
 import unittest
+from unittest import mock
 
 from analytics_mcp.tools import utils
 
@@ -68,3 +69,17 @@ class TestUtils(unittest.TestCase):
             msg="Resource name with more than 2 components should fail",
         ):
             utils.construct_property_rn("properties/123/abc")
+
+    def test_create_credentials_is_cached(self):
+        """Tests that credentials are only resolved once."""
+        utils._create_credentials.cache_clear()
+        self.addCleanup(utils._create_credentials.cache_clear)
+        credentials = mock.Mock()
+        with mock.patch.object(
+            utils.google.auth,
+            "default",
+            return_value=(credentials, "project"),
+        ) as default:
+            self.assertIs(utils._create_credentials(), credentials)
+            self.assertIs(utils._create_credentials(), credentials)
+        default.assert_called_once()